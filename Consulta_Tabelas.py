@@ -153,7 +153,11 @@ def calcular_resumos(conn, tipo, categoria=None, ano=None, mes=None, texto=None,
     return total_ano, total_mes
 
 
-def pagina_consulta_tabelas(get_connection):
+def pagina_consulta_tabelas(db_connection):
+    """
+    db_connection: context manager do controle.py que empresta uma conexão
+    do pool e a devolve ao final da página.
+    """
     st.title("🔍 Consulta de lançamentos")
 
     # Verifica usuário logado
@@ -162,8 +166,11 @@ def pagina_consulta_tabelas(get_connection):
         st.warning("Você precisa estar logado para consultar seus lançamentos.")
         return
 
-    conn = get_connection()
+    with db_connection() as conn:
+        renderizar_consulta(conn, user_id)
+
 
+def renderizar_consulta(conn, user_id):
     # Escolha do tipo de lançamento (mesma lógica do app)
     aba = st.radio(
         "Selecione o tipo de lançamento",
@@ -1,9 +1,12 @@
 import streamlit as st
-import psycopg2
+from psycopg2.extras import execute_batch, execute_values
+from psycopg2.pool import ThreadedConnectionPool
+from contextlib import contextmanager
 from datetime import date
 import altair as alt
 from dateutil.relativedelta import relativedelta
 import pandas as pd
+import numpy as np
 import hashlib
 
 from Consulta_Tabelas import pagina_consulta_tabelas
@@ -26,49 +29,124 @@ DB_PATH = "finance.db"
 
 # ---------- Banco de Dados ----------
 
-def get_connection():
+# SQL fixo, montado uma única vez no import do módulo
+# INSERT multi-linha (execute_values expande o %s em várias tuplas)
+_INSERT_TX_BULK_SQL = """
+    INSERT INTO transactions
+    (user_id, type, category, date, amount, payment_type, card_name, installments, description)
+    VALUES %s
+"""
+
+# totais por mês/tipo/categoria calculados no próprio banco
+_SUMMARY_SQL = """
+    SELECT date_trunc('month', date)::date AS ym,
+           type,
+           category,
+           COALESCE(type = 'saida' AND payment_type = 'Cartão de crédito', FALSE) AS cartao,
+           SUM(amount) AS amount
+    FROM transactions
+    WHERE user_id = %s AND date BETWEEN %s AND %s
+    GROUP BY 1, 2, 3, 4
+    ORDER BY 1
+"""
+
+# índices para os filtros por usuário + data (e tipo) usados no app
+_INDEXES_SQL = (
+    "CREATE INDEX IF NOT EXISTS idx_tx_user_date ON transactions (user_id, date)",
+    "CREATE INDEX IF NOT EXISTS idx_tx_user_type_date ON transactions (user_id, type, date)",
+)
+
+_UPDATE_TX_SQL = """
+    UPDATE transactions
+    SET type = %s, category = %s, date = %s, amount = %s,
+        payment_type = %s, card_name = %s, installments = %s, description = %s
+    WHERE id = %s
+"""
+
+@st.cache_resource(show_spinner=False)
+def get_pool():
+    """Pool de conexões compartilhado por todas as sessões do processo."""
     dsn = st.secrets["supabase_db"]["url"]
-    conn = psycopg2.connect(dsn, sslmode="require")
-    return conn
+    return ThreadedConnectionPool(1, 10, dsn, sslmode="require")
+
+
+@contextmanager
+def db_connection():
+    """
+    Empresta uma conexão do pool: commit ao sair do bloco, rollback em erro.
+    Conexões que caíram (ex.: timeout do servidor) são descartadas do pool.
+    """
+    pool = get_pool()
+    conn = pool.getconn()
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        if not conn.closed:
+            conn.rollback()
+        raise
+    finally:
+        pool.putconn(conn, close=bool(conn.closed))
 
 
+@st.cache_resource(show_spinner=False)
 def init_db():
     # Como já criamos a tabela no Supabase,
-    # aqui apenas testamos a conexão
-    conn = get_connection()
-    conn.close()
+    # aqui apenas testamos a conexão e garantimos os índices
+    # (uma vez por processo, graças ao cache_resource)
+    with db_connection() as conn:
+        cur = conn.cursor()
+        for sql in _INDEXES_SQL:
+            cur.execute(sql)
+        cur.execute("ANALYZE transactions")
 
 def insert_transaction(user_id, t_type, category, d, amount, payment_type, card_name, installments, description):
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        INSERT INTO transactions
-        (user_id, type, category, date, amount, payment_type, card_name, installments, description)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """,
-        (user_id, t_type, category, d, amount, payment_type, card_name, installments, description),
+    # um lançamento é só um lote de tamanho 1
+    insert_transactions_bulk(
+        [(user_id, t_type, category, d, amount, payment_type, card_name, installments, description)]
     )
-    conn.commit()
-    conn.close()
 
 
+def insert_transactions_bulk(rows):
+    """
+    Insere vários lançamentos de uma vez (ex.: parcelas ou importação).
+    Cada item de rows segue a ordem de insert_transaction:
+    (user_id, type, category, date, amount, payment_type, card_name, installments, description)
+    """
+    if not rows:
+        return
+    with db_connection() as conn:
+        cur = conn.cursor()
+        execute_values(cur, _INSERT_TX_BULK_SQL, rows, page_size=1000)
+    invalidate_data_cache()
+
 
+@st.cache_data(ttl=300, show_spinner=False)
 def load_data(user_id):
-    conn = get_connection()
-    df = pd.read_sql_query("""
-        SELECT * 
-        FROM transactions 
-        WHERE user_id = %s AND user_id IS NOT NULL
-        ORDER BY date DESC
-        """,
-        conn,
-        params=(str(user_id),),
-    )
-    conn.close()
-    if not df.empty:
-        df["date"] = pd.to_datetime(df["date"]).dt.date
-    return df
+    """
+    Carrega os lançamentos do usuário (ordenados por data).
+    Fica em cache por até 5 minutos; toda escrita chama invalidate_data_cache().
+    """
+    with db_connection() as conn:
+        df = pd.read_sql_query("""
+            SELECT id, type, category, date, amount,
+                   payment_type, card_name, installments, description
+            FROM transactions 
+            WHERE user_id = %s AND user_id IS NOT NULL
+            ORDER BY date
+            """,
+            conn,
+            params=(str(user_id),),
+            parse_dates=["date"],
+        )
+    # colunas de baixa cardinalidade viram categóricas (menos memória, filtros mais rápidos)
+    return df.astype({"type": "category", "payment_type": "category", "category": "category"})
+
+
+def invalidate_data_cache():
+    """Descarta os dados em cache depois de qualquer escrita no banco."""
+    load_data.clear()
+    _compute_month_summary.clear()
 
 
 # ---------- Autenticação / Login ----------
@@ -91,18 +169,17 @@ def authenticate_user(email: str, password: str):
     if not email or not password:
         return None
 
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        SELECT id, email, password
-        FROM app_users
-        WHERE email = %s
-        """,
-        (email.strip().lower(),),
-    )
-    row = cur.fetchone()
-    conn.close()
+    with db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            SELECT id, email, password
+            FROM app_users
+            WHERE email = %s
+            """,
+            (email.strip().lower(),),
+        )
+        row = cur.fetchone()
 
     if not row:
         return None
@@ -118,29 +195,26 @@ def create_user(email: str, password: str):
     """Cria um novo usuário no Supabase via tela de cadastro."""
     hashed = hash_password(password)
 
-    conn = get_connection()
-    cur = conn.cursor()
+    with db_connection() as conn:
+        cur = conn.cursor()
 
-    # Verifica se email já existe
-    cur.execute("SELECT id FROM app_users WHERE email = %s", (email.strip().lower(),))
-    existing = cur.fetchone()
+        # Verifica se email já existe
+        cur.execute("SELECT id FROM app_users WHERE email = %s", (email.strip().lower(),))
+        existing = cur.fetchone()
 
-    if existing:
-        conn.close()
-        return None  # já existe
+        if existing:
+            return None  # já existe
 
-    cur.execute(
-        """
-        INSERT INTO app_users (email, password)
-        VALUES (%s, %s)
-        RETURNING id
-        """,
-        (email.strip().lower(), hashed),
-    )
+        cur.execute(
+            """
+            INSERT INTO app_users (email, password)
+            VALUES (%s, %s)
+            RETURNING id
+            """,
+            (email.strip().lower(), hashed),
+        )
 
-    user_id = cur.fetchone()[0]
-    conn.commit()
-    conn.close()
+        user_id = cur.fetchone()[0]
 
     return user_id
 
@@ -242,6 +316,12 @@ def login_screen():
 
 # ---------- Lógica de Resumo ----------
 
+# ordem fixa dos tipos de lançamento (usada para somar por código)
+TIPOS_LANCAMENTO = ["entrada", "saida", "investimento"]
+
+# colunas do histórico de 6 meses, na ordem de exibição
+HIST_COLUNAS = ["Receitas", "Despesas", "Investimentos"]
+
 def get_month_range(target_date=None):
     if target_date is None:
         target_date = date.today()
@@ -250,7 +330,44 @@ def get_month_range(target_date=None):
     last_day = next_month - relativedelta(days=1)
     return first_day, last_day
 
-def compute_summary(df, ref_date):
+def slice_by_date(df, start, end, col="date"):
+    """
+    Retorna a fatia de df com start <= df[col] <= end.
+    df precisa estar ordenado por col (as consultas já usam ORDER BY), então
+    a busca é binária e o resultado é uma fatia contígua, sem máscara.
+    """
+    i0 = df[col].searchsorted(pd.Timestamp(start), side="left")
+    i1 = df[col].searchsorted(pd.Timestamp(end), side="right")
+    return df.iloc[i0:i1]
+
+def load_summary_data(user_id, start, end):
+    """
+    Agrega no banco os lançamentos do período por mês/tipo/categoria.
+    A coluna 'cartao' marca as saídas no cartão de crédito (não mexem no caixa).
+    Os valores vêm em centavos inteiros ('cents'), para somar sem erro de arredondamento.
+    """
+    with db_connection() as conn:
+        df = pd.read_sql_query(
+            _SUMMARY_SQL,
+            conn,
+            params=(str(user_id), start, end),
+            parse_dates=["ym"],
+        )
+    df["cents"] = np.round(df["amount"].to_numpy(dtype="float64") * 100).astype(np.int64)
+    return df.drop(columns="amount")
+
+def compute_summary(user_id, ref_date):
+    # o resultado só depende do mês de referência, não do dia escolhido
+    return _compute_month_summary(user_id, ref_date.year, ref_date.month)
+
+@st.cache_data(ttl=300, show_spinner=False)
+def _compute_month_summary(user_id, ref_year, ref_month):
+    first_day, last_day = get_month_range(date(ref_year, ref_month, 1))
+    six_months_ago = first_day - relativedelta(months=5)
+
+    # últimos 6 meses já agregados pelo banco (poucas linhas)
+    df = load_summary_data(user_id, six_months_ago, last_day)
+
     if df.empty:
         return {
             "total_entrada": 0.0,
@@ -260,26 +377,27 @@ def compute_summary(df, ref_date):
             "perc_comprometido": 0.0,
         }, pd.DataFrame(), pd.DataFrame()
 
-    first_day, last_day = get_month_range(ref_date)
-    mask_month = (df["date"] >= first_day) & (df["date"] <= last_day)
-    df_month = df[mask_month].copy()
+    df_month = slice_by_date(df, first_day, last_day, col="ym")
 
     # ✅ Fluxo de caixa considera APENAS o que mexe na conta
     #    - entradas: todas
     #    - saídas: exceto cartão de crédito (gasto futuro)
     #    - investimentos: todos (saem da conta)
-    total_entrada = df_month.loc[df_month["type"] == "entrada", "amount"].sum()
+    # códigos: 0 = tipo desconhecido, 1 = entrada, 2 = saida, 3 = investimento
+    codes = pd.Index(TIPOS_LANCAMENTO).get_indexer(df_month["type"]) + 1
+    cents = df_month["cents"].to_numpy()
 
     # saídas que realmente saem da conta (não cartão)
-    mask_saidas_caixa = (df_month["type"] == "saida") & (
-        df_month["payment_type"] != "Cartão de crédito"
-    )
-    total_saida = df_month.loc[mask_saidas_caixa, "amount"].sum()
+    mask_saidas_caixa = (codes == 2) & ~df_month["cartao"].to_numpy(dtype=bool)
 
-    total_investimento = df_month.loc[df_month["type"] == "investimento", "amount"].sum()
+    # uma única passada soma os três tipos (saída de cartão pesa zero)
+    pesos = np.where((codes == 2) & ~mask_saidas_caixa, 0, cents)
+    somas = np.bincount(codes, weights=pesos, minlength=len(TIPOS_LANCAMENTO) + 1)
+    total_entrada, total_saida, total_investimento = somas[1:4] / 100
 
     # 🔹 saldo líquido: entradas - saídas (que afetam caixa) - investimentos
-    saldo = total_entrada - total_saida - total_investimento
+    #    (conta feita em centavos, só vira reais no fim)
+    saldo = (somas[1] - somas[2] - somas[3]) / 100
 
     # 🔹 renda comprometida: saídas (que afetam caixa) + investimentos
     comprometido = total_saida + total_investimento
@@ -288,25 +406,30 @@ def compute_summary(df, ref_date):
     # Despesas por categoria no mês (somente saída de fluxo)
     df_cat = (
         df_month[mask_saidas_caixa]
-        .groupby("category")["amount"]
+        .groupby("category", sort=False, observed=True)["cents"]
         .sum()
+        .sort_values(ascending=False)
+        .div(100)
+        .rename("amount")
         .reset_index()
-        .sort_values("amount", ascending=False)
     )
 
-    # Histórico últimos 6 meses (entrada/saida/investimento)
-    six_months_ago = first_day - relativedelta(months=5)
-    mask_hist = (df["date"] >= six_months_ago) & (df["date"] <= last_day)
-    df_hist = df[mask_hist].copy()
+    # Histórico últimos 6 meses (entrada/saida/investimento), sem cartão
+    df_hist = df[~df["cartao"].to_numpy(dtype=bool)]
     if not df_hist.empty:
-        mask_cc_hist = (df_hist["type"] == "saida") & (df_hist["payment_type"] == "Cartão de crédito")
-        df_hist = df_hist[~mask_cc_hist]
-    if not df_hist.empty:
-        df_hist["ym"] = df_hist["date"].apply(lambda d: d.replace(day=1))
-        df_hist = df_hist.groupby(["ym", "type"])["amount"].sum().reset_index()
-        df_hist_pivot = df_hist.pivot(index="ym", columns="type", values="amount").fillna(0)
-        df_hist_pivot = df_hist_pivot.rename(columns={"entrada": "Receitas", "saida": "Despesas"})
-        df_hist_pivot = df_hist_pivot.sort_index()
+        df_hist_pivot = (
+            df_hist.groupby(["ym", "type"], sort=True, observed=True)["cents"]
+            .sum()
+            .unstack("type", fill_value=0)
+            .div(100)
+            .rename(columns={"entrada": "Receitas", "saida": "Despesas", "investimento": "Investimentos"})
+            # garante as 3 colunas SEMPRE, na ordem do gráfico/tabela
+            .reindex(columns=HIST_COLUNAS, fill_value=0.0)
+            .rename_axis(columns=None)
+            .astype(float)
+        )
+        # rótulo MM/AA formatado uma única vez (o resumo fica em cache)
+        df_hist_pivot.insert(0, "Mês", df_hist_pivot.index.strftime("%m/%y"))
     else:
         df_hist_pivot = pd.DataFrame()
 
@@ -322,11 +445,28 @@ def compute_summary(df, ref_date):
 
 # ---------- Formatação BRL ----------
 
+# troca "," <-> "." (milhar/decimal) numa única passada
+_BRL_SEPARADORES = str.maketrans({",": ".", ".": ","})
+
 def format_brl(value: float) -> str:
     """
     Formata número no padrão brasileiro: R$ 23.306,10
     """
-    return f"R$ {value:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+    # o arredondamento fica com o ":,.2f"; a troca de separadores é uma só passada
+    return f"R$ {value:,.2f}".translate(_BRL_SEPARADORES)
+
+def format_brl_series(valores: pd.Series, simbolo: bool = True) -> pd.Series:
+    """
+    Versão em lote de format_brl para uma coluna inteira
+    (mesmo arredondamento do ":,.2f" e uma única troca de separadores).
+    Com simbolo=False devolve só o número (ex.: 1.234,56); vazios viram "".
+    """
+    prefixo = "R$ " if simbolo else ""
+    textos = [
+        "" if np.isnan(v) else prefixo + f"{v:,.2f}".translate(_BRL_SEPARADORES)
+        for v in valores.to_numpy(dtype="float64").tolist()
+    ]
+    return pd.Series(textos, index=valores.index, dtype=object)
 
 def format_percent(value: float) -> str:
     """
@@ -334,6 +474,9 @@ def format_percent(value: float) -> str:
     """
     return f"{value:,.1f}%".replace(",", "X").replace(".", ",").replace("X", ".")
 
+# remove "R", "$", pontos de milhar e espaços; vírgula decimal vira ponto
+_BRL_TRANSLATE = str.maketrans({",": ".", ".": None, "R": None, "$": None, " ": None})
+
 def parse_brl_to_float(valor_str: str) -> float:
     """
     Converte string em formato brasileiro (23.306,10) para float (23306.10).
@@ -341,342 +484,319 @@ def parse_brl_to_float(valor_str: str) -> float:
     """
     if not valor_str:
         return 0.0
-    s = valor_str.strip()
-    s = s.replace("R$", "").strip()
-    s = s.replace(".", "").replace(",", ".")
     try:
-        return float(s)
+        return float(valor_str.translate(_BRL_TRANSLATE))
     except ValueError:
         return 0.0
 
-# ---------- Estilo visual ----------
-
-def apply_custom_style():
-    st.markdown(
-        """
-        <style>
-        * {
-            max-width: 100%;
-            box-sizing: border-box;
-        }
-
-        /* Fundo geral */
-        .stApp {
-            background: radial-gradient(circle at top left, #0f172a 0, #020617 45%, #020617 100%);
-            color: #e5e7eb;
-            font-family: system-ui, -apple-system, BlinkMacSystemFont, "Segoe UI", sans-serif;
-        }
-
-        /* Header */
-        .cf-header {
-            display: flex;
-            justify-content: space-between;
-            flex-wrap: wrap;
-            align-items: center;
-            margin-bottom: 1.5rem;
-            padding: 0.5rem 0.25rem 0.75rem;
-            border-bottom: 1px solid rgba(148, 163, 184, 0.3);
-        }
-
-        .cf-title {
-            font-size: 1.6rem;
-            font-weight: 600;
-            margin: 0;
-        }
-
-        .cf-subtitle {
-            font-size: 0.9rem;
-            color: #9ca3af;
-            margin-top: 0.15rem;
-        }
-
-        .cf-subtitle strong {
-            color: #e5e7eb;
-        }
-
-        .cf-pill {
-            font-size: 0.8rem;
-            padding: 0.25rem 0.6rem;
-            border-radius: 999px;
-            background: rgba(148, 163, 184, 0.22);
-            color: #e5e7eb;
-            border: 1px solid rgba(148, 163, 184, 0.35);
-        }
-
-        /* Cards de resumo */
-        .cf-card {
-            width: 100%;
-            min-width: 0;
-            border-radius: 0.9rem;
-            padding: 0.9rem 1rem;
-            border: 1px solid rgba(148, 163, 184, 0.25);
-            background: radial-gradient(
-                circle at top left,
-                rgba(148, 163, 184, 0.15),
-                rgba(15, 23, 42, 0.9)
-            );
-            box-shadow: 0 18px 45px rgba(15, 23, 42, 0.65);
-            backdrop-filter: blur(8px);
-        }
-
-        .cf-card-label {
-            font-size: 0.78rem;
-            text-transform: uppercase;
-            letter-spacing: 0.08em;
-            color: #9ca3af;
-            margin-bottom: 0.3rem;
-        }
-
-        .cf-card-value {
-            font-size: 1.45rem;
-            font-weight: 600;
-        }
-
-        .cf-card-extra {
-            font-size: 0.75rem;
-            color: #9ca3af;
-            margin-top: 0.25rem;
-        }
-
-        .cf-card-income .cf-card-value {
-            color: #4ade80;
-        }
-
-        .cf-card-expense .cf-card-value {
-            color: #f97373;
-        }
-
-        .cf-card-balance-positive .cf-card-value {
-            color: #22c55e;
-        }
-
-        .cf-card-balance-negative .cf-card-value {
-            color: #fb7185;
-        }
-
-        .cf-card-ratio .cf-card-value {
-            color: #60a5fa;
-        }
-        </style>
-        """,
-        unsafe_allow_html=True,
-    )
+def parse_brl_series(valores: pd.Series) -> pd.Series:
+    """
+    Versão vetorizada de parse_brl_to_float para uma coluna inteira
+    (mesma limpeza via _BRL_TRANSLATE). Valores vazios ou inválidos viram 0.0.
+    """
+    limpos = valores.astype("string").str.translate(_BRL_TRANSLATE)
+    return pd.to_numeric(limpos, errors="coerce").fillna(0.0).astype("float64")
 
+# ---------- Estilo visual ----------
 
-# ---------- App Streamlit ----------
+# CSS do app: string constante, montada uma única vez no import.
+# O st.markdown continua a cada rerun porque o Streamlit remove da página
+# os elementos que não são emitidos novamente.
+_CF_CSS = """
+<style>
+* {
+    max-width: 100%;
+    box-sizing: border-box;
+}
+
+/* Fundo geral */
+.stApp {
+    background: radial-gradient(circle at top left, #0f172a 0, #020617 45%, #020617 100%);
+    color: #e5e7eb;
+    font-family: system-ui, -apple-system, BlinkMacSystemFont, "Segoe UI", sans-serif;
+}
+
+/* Header */
+.cf-header {
+    display: flex;
+    justify-content: space-between;
+    flex-wrap: wrap;
+    align-items: center;
+    margin-bottom: 1.5rem;
+    padding: 0.5rem 0.25rem 0.75rem;
+    border-bottom: 1px solid rgba(148, 163, 184, 0.3);
+}
+
+.cf-title {
+    font-size: 1.6rem;
+    font-weight: 600;
+    margin: 0;
+}
+
+.cf-subtitle {
+    font-size: 0.9rem;
+    color: #9ca3af;
+    margin-top: 0.15rem;
+}
+
+.cf-subtitle strong {
+    color: #e5e7eb;
+}
+
+.cf-pill {
+    font-size: 0.8rem;
+    padding: 0.25rem 0.6rem;
+    border-radius: 999px;
+    background: rgba(148, 163, 184, 0.22);
+    color: #e5e7eb;
+    border: 1px solid rgba(148, 163, 184, 0.35);
+}
+
+/* Cards de resumo */
+.cf-grid {
+    display: grid;
+    grid-template-columns: repeat(4, minmax(0, 1fr));
+    gap: 1rem;
+}
+
+@media (max-width: 640px) {
+    .cf-grid {
+        grid-template-columns: 1fr;
+    }
+}
+
+.cf-card {
+    width: 100%;
+    min-width: 0;
+    border-radius: 0.9rem;
+    padding: 0.9rem 1rem;
+    border: 1px solid rgba(148, 163, 184, 0.25);
+    background: radial-gradient(
+        circle at top left,
+        rgba(148, 163, 184, 0.15),
+        rgba(15, 23, 42, 0.9)
+    );
+    box-shadow: 0 18px 45px rgba(15, 23, 42, 0.65);
+    backdrop-filter: blur(8px);
+}
+
+.cf-card-label {
+    font-size: 0.78rem;
+    text-transform: uppercase;
+    letter-spacing: 0.08em;
+    color: #9ca3af;
+    margin-bottom: 0.3rem;
+}
+
+.cf-card-value {
+    font-size: 1.45rem;
+    font-weight: 600;
+}
+
+.cf-card-extra {
+    font-size: 0.75rem;
+    color: #9ca3af;
+    margin-top: 0.25rem;
+}
+
+.cf-card-income .cf-card-value {
+    color: #4ade80;
+}
+
+.cf-card-expense .cf-card-value {
+    color: #f97373;
+}
+
+.cf-card-balance-positive .cf-card-value {
+    color: #22c55e;
+}
+
+.cf-card-balance-negative .cf-card-value {
+    color: #fb7185;
+}
+
+.cf-card-ratio .cf-card-value {
+    color: #60a5fa;
+}
+</style>
+"""
+
+
+# molde de um card de resumo (preenchido por .format no dashboard)
+_CARD_TEMPLATE = (
+    '<div class="cf-card {cls}">'
+    '<div class="cf-card-label">{lbl}</div>'
+    '<div class="cf-card-value">{val}</div>'
+    '<div class="cf-card-extra">{extra}</div>'
+    '</div>'
+)
 
-def main():
-    # você já chamou st.set_page_config lá em cima do arquivo;
-    st.set_page_config(
-        page_title="Controle Financeiro",
-        page_icon="💰",
-        layout="wide",
-        initial_sidebar_state="expanded",
-    )
-  
-    apply_custom_style()
-    init_db()
 
-    # 1) Se não estiver logado, chama tela de login/cadastro
-    user = login_screen()  # desenha login + criar conta
+def apply_custom_style():
+    st.markdown(_CF_CSS, unsafe_allow_html=True)
 
-    if not user:
-        # Ainda não logou (primeiro acesso / preenchendo formulário)
-        st.stop()
 
-    # 2) Se chegou aqui, já está logado
-    user_id = user["id"]
-    user_email = user["email"]
+# ---------- App Streamlit ----------
 
-    # --- Navegação entre páginas ---
-    pagina = st.sidebar.radio(
-        "Navegação",
-        ["Dashboard", "Análises", "Tabelas", "Cartão de Crédito"],
-        horizontal=False
+@st.fragment
+def novo_lancamento(user_id, today):
+    """
+    Formulário "Novo lançamento" da sidebar.
+    Roda como fragmento: trocar tipo/forma de pagamento só reexecuta este bloco.
+    """
+    # Categorias pré-definidas
+    income_categories = [
+        "Salário",
+        "Renda Extra",
+        "Dividendos",
+        "Reembolso",
+        "Outros"
+    ]
+
+    expense_categories = [
+        "Mercado",
+        "Compras",
+        "Condomínio",
+        "Luz",
+        "Internet",
+        "Transporte",
+        "Combustível",
+        "Saúde",
+        "Despesas Domésticas",
+        "Lazer",
+        "Assinaturas",
+        "Educação",
+        "Restaurante",
+        "Financiamento",
+        "Pagamento de Cartão",
+        "Outros"
+    ]
+
+    investment_categories = [
+        "Renda Fixa",
+        "Renda Variável",
+        "Exterior",
+        "Reserva de Despesa",
+        "Outra"
+    ]
+
+    # --- NOVO LANÇAMENTO ---
+    st.markdown("<hr style='margin: 0.75rem 0;'>", unsafe_allow_html=True)
+    st.subheader("Novo lançamento")
+    
+    # -------------------------------------------
+    # 1) Tipo (reativo)
+    # -------------------------------------------
+    t_type = st.radio(
+        "Tipo",
+        ["entrada", "saida", "investimento"],
+        horizontal=True,
     )
-
-    user_id = st.session_state["user_id"]
-
-    # Carrega dados uma única vez (para Dashboard e Análises)
-    df = load_data(user_id)
-
-    # 👉 Se for análises, chama render_analises e sai
-    if pagina == "Análises":
-        render_analises(df)
-        return
-
-    # 👉 Se for consulta de tabelas, chama o módulo e não renderiza o dashboard
-    if pagina == "Tabelas":
-        pagina_consulta_tabelas(get_connection)
-        return
-    # 👉 Se for cartão de crédito, chama o módulo e não renderiza o dashboard
-    if pagina == "Cartão de Crédito":
-        pagina_cartao(df)
-        return
-   
-    # --- SIDEBAR DO DASHBOARD ---
-    with st.sidebar:
-        st.header("Filtros")
-        today = date.today()
-        ref_date = st.date_input(
-            "Mês de referência",
-            value=today,
-            format="DD/MM/YYYY"
+    
+    # Divisor
+    st.markdown("<hr style='margin-top:0; margin-bottom:12px; opacity:0.35;'>", unsafe_allow_html=True)
+    
+    # -------------------------------------------
+    # 2) Forma de pagamento (só para SAÍDA)
+    # -------------------------------------------
+    if t_type == "saida":
+        payment_type = st.selectbox(
+            "Forma de pagamento",
+            ["Conta", "Cartão de crédito", "Dinheiro", "Pix"],
         )
-       # st.markdown("---")
+    else:
+        payment_type = "Conta"
     
-        # Categorias pré-definidas
-        income_categories = [
-            "Salário",
-            "Renda Extra",
-            "Dividendos",
-            "Reembolso",
-            "Outros"
-        ]
+    # Deve mostrar campos de cartão?
+    show_card_fields = (t_type == "saida" and payment_type == "Cartão de crédito")
     
-        expense_categories = [
-            "Mercado",
-            "Compras",
-            "Condomínio",
-            "Luz",
-            "Internet",
-            "Transporte",
-            "Combustível",
-            "Saúde",
-            "Despesas Domésticas",
-            "Lazer",
-            "Assinaturas",
-            "Educação",
-            "Restaurante",
-            "Financiamento",
-            "Pagamento de Cartão",
-            "Outros"
-        ]
+    # Outro divisor
+    st.markdown("<hr style='margin-top:0; margin-bottom:12px; opacity:0.35;'>", unsafe_allow_html=True)
     
-        investment_categories = [
-            "Renda Fixa",
-            "Renda Variável",
-            "Exterior",
-            "Reserva de Despesa",
-            "Outra"
-        ]
+    # -------------------------------------------
+    # 3) FORMULÁRIO (limpa depois de salvar)
+    # -------------------------------------------
+    with st.form("novo_lancamento", clear_on_submit=True):
     
-        # --- NOVO LANÇAMENTO ---
-        st.markdown("<hr style='margin: 0.75rem 0;'>", unsafe_allow_html=True)
-        st.subheader("Novo lançamento")
-        
-        # -------------------------------------------
-        # 1) Tipo (reativo)
-        # -------------------------------------------
-        t_type = st.radio(
-            "Tipo",
-            ["entrada", "saida", "investimento"],
-            horizontal=True,
-        )
-        
-        # Divisor
-        st.markdown("<hr style='margin-top:0; margin-bottom:12px; opacity:0.35;'>", unsafe_allow_html=True)
-        
-        # -------------------------------------------
-        # 2) Forma de pagamento (só para SAÍDA)
-        # -------------------------------------------
-        if t_type == "saida":
-            payment_type = st.selectbox(
-                "Forma de pagamento",
-                ["Conta", "Cartão de crédito", "Dinheiro", "Pix"],
-            )
+        # Categorias dinâmicas
+        if t_type == "entrada":
+            cat_choice = st.selectbox("Categoria", income_categories + ["Outra"])
+        elif t_type == "saida":
+            cat_choice = st.selectbox("Categoria", expense_categories + ["Outra"])
         else:
-            payment_type = "Conta"
-        
-        # Deve mostrar campos de cartão?
-        show_card_fields = (t_type == "saida" and payment_type == "Cartão de crédito")
-        
-        # Outro divisor
-        st.markdown("<hr style='margin-top:0; margin-bottom:12px; opacity:0.35;'>", unsafe_allow_html=True)
-        
-        # -------------------------------------------
-        # 3) FORMULÁRIO (limpa depois de salvar)
-        # -------------------------------------------
-        with st.form("novo_lancamento", clear_on_submit=True):
-        
-            # Categorias dinâmicas
-            if t_type == "entrada":
-                cat_choice = st.selectbox("Categoria", income_categories + ["Outra"])
-            elif t_type == "saida":
-                cat_choice = st.selectbox("Categoria", expense_categories + ["Outra"])
-            else:
-                cat_choice = st.selectbox("Categoria", investment_categories)
-        
-            if cat_choice == "Outra":
-                category = st.text_input("Categoria personalizada")
-            else:
-                category = cat_choice
-        
-            # Data
-            d = st.date_input("Data", value=today, format="DD/MM/YYYY")
-        
-            # Valor (sempre aparece)
-            valor_str = st.text_input("Valor (R$)", value="", placeholder="0,00")
-        
-            # -------------------------------------------
-            # Campos de cartão — SÓ aparecem se for saída + cartão
-            # -------------------------------------------
-            if show_card_fields:
-                col_parc, col_card = st.columns([1, 2])
-        
-                with col_parc:
-                    installments = st.number_input(
-                        "Parcelas",
-                        min_value=1,
-                        value=1,
-                        step=1,
-                    )
-        
-                with col_card:
-                    card_name = st.text_input("Cartão")
-            else:
-                installments = 1
-                card_name = ""
-        
-            # Descrição
-            description = st.text_area("Descrição (opcional)")
-        
-            # Botão do form
-            submitted = st.form_submit_button("Salvar lançamento", use_container_width=True)
-        
+            cat_choice = st.selectbox("Categoria", investment_categories)
+    
+        if cat_choice == "Outra":
+            category = st.text_input("Categoria personalizada")
+        else:
+            category = cat_choice
+    
+        # Data
+        d = st.date_input("Data", value=today, format="DD/MM/YYYY")
+    
+        # Valor (sempre aparece)
+        valor_str = st.text_input("Valor (R$)", value="", placeholder="0,00")
+    
         # -------------------------------------------
-        # PROCESSAMENTO DO ENVIO
+        # Campos de cartão — SÓ aparecem se for saída + cartão
         # -------------------------------------------
-        if submitted:
-            amount = parse_brl_to_float(valor_str)
-        
-            if amount > 0 and category.strip():
-                insert_transaction(
-                    user_id,
-                    t_type,
-                    category,
-                    d,
-                    amount,
-                    payment_type,
-                    card_name,
-                    installments,
-                    description,
+        if show_card_fields:
+            col_parc, col_card = st.columns([1, 2])
+    
+            with col_parc:
+                installments = st.number_input(
+                    "Parcelas",
+                    min_value=1,
+                    value=1,
+                    step=1,
                 )
-                st.success("Lançamento salvo com sucesso!")
-                st.rerun()
-            else:
-                st.error("Preencha categoria e valor maior que zero.")
-
-    if "user_id" not in st.session_state:
-        st.error("Erro: usuário não autenticado. Volte para a tela de login.")
-        st.stop()
+    
+            with col_card:
+                card_name = st.text_input("Cartão")
+        else:
+            installments = 1
+            card_name = ""
+    
+        # Descrição
+        description = st.text_area("Descrição (opcional)")
+    
+        # Botão do form
+        submitted = st.form_submit_button("Salvar lançamento", use_container_width=True)
+    
+    # -------------------------------------------
+    # PROCESSAMENTO DO ENVIO
+    # -------------------------------------------
+    if submitted:
+        amount = parse_brl_to_float(valor_str)
+    
+        if amount > 0 and category.strip():
+            insert_transaction(
+                user_id,
+                t_type,
+                category,
+                d,
+                amount,
+                payment_type,
+                card_name,
+                installments,
+                description,
+            )
+            st.success("Lançamento salvo com sucesso!")
+            st.rerun()
+        else:
+            st.error("Preencha categoria e valor maior que zero.")
 
-    user_id = st.session_state["user_id"]
 
+@st.fragment
+def render_dashboard(user_id, ref_date):
+    """
+    Header, cards, gráficos e últimos lançamentos do mês de referência.
+    Roda como fragmento: interações na tabela não reexecutam a sidebar.
+    """
     # --- DADOS ---
     df = load_data(user_id)
-       
-    resumo, df_cat, df_hist = compute_summary(df, ref_date)
+
+    resumo, df_cat, df_hist = compute_summary(user_id, ref_date)
 
     # --- HEADER NOVO ---
     st.markdown(
@@ -699,30 +819,6 @@ def main():
     )
 
     # --- CARDS DE RESUMO ---
-    col1, col2, col3, col4 = st.columns(4)
-
-    col1.markdown(
-        f"""
-        <div class="cf-card cf-card-income">
-            <div class="cf-card-label">Renda do mês</div>
-            <div class="cf-card-value">{format_brl(resumo['total_entrada'])}</div>
-            <div class="cf-card-extra">Somatório de todas as entradas no período selecionado.</div>
-        </div>
-        """,
-        unsafe_allow_html=True,
-    )
-    
-    col2.markdown(
-        f"""
-        <div class="cf-card cf-card-expense">
-            <div class="cf-card-label">Despesas do mês</div>
-            <div class="cf-card-value">{format_brl(resumo['total_saida'])}</div>
-            <div class="cf-card-extra">Somatório de todas as saídas no período.</div>
-        </div>
-        """,
-        unsafe_allow_html=True,
-    )
-    
     saldo_class = "cf-card-balance-positive" if resumo["saldo"] >= 0 else "cf-card-balance-negative"
     if resumo["saldo"] >= 0:
         saldo_label_extra = (
@@ -734,30 +830,22 @@ def main():
             f"Atenção: você gastou + investiu mais do que ganhou.<br/>"
             f"Investido no mês: {format_brl(resumo['total_investimento'])}"
         )
-    
-    col3.markdown(
-        f"""
-        <div class="cf-card {saldo_class}">
-            <div class="cf-card-label">Saldo líquido do mês</div>
-            <div class="cf-card-value">{format_brl(resumo['saldo'])}</div>
-            <div class="cf-card-extra">{saldo_label_extra}</div>
-        </div>
-        """,
-        unsafe_allow_html=True,
-    )
-    
-    col4.markdown(
-        f"""
-        <div class="cf-card cf-card-ratio">
-            <div class="cf-card-label">Renda comprometida</div>
-            <div class="cf-card-value">{format_percent(resumo['perc_comprometido'])}</div>
-            <div class="cf-card-extra">
-                Considera despesas + investimentos em relação à renda do mês.
-            </div>
-        </div>
-        """,
-        unsafe_allow_html=True,
+
+    # os 4 cards vão num único st.markdown, lado a lado via CSS grid (.cf-grid)
+    cards = [
+        ("cf-card-income", "Renda do mês", format_brl(resumo["total_entrada"]),
+         "Somatório de todas as entradas no período selecionado."),
+        ("cf-card-expense", "Despesas do mês", format_brl(resumo["total_saida"]),
+         "Somatório de todas as saídas no período."),
+        (saldo_class, "Saldo líquido do mês", format_brl(resumo["saldo"]), saldo_label_extra),
+        ("cf-card-ratio", "Renda comprometida", format_percent(resumo["perc_comprometido"]),
+         "Considera despesas + investimentos em relação à renda do mês."),
+    ]
+    cards_html = "".join(
+        _CARD_TEMPLATE.format(cls=cls, lbl=lbl, val=val, extra=extra)
+        for cls, lbl, val, extra in cards
     )
+    st.markdown(f'<div class="cf-grid">{cards_html}</div>', unsafe_allow_html=True)
 
     st.markdown("---")
 
@@ -769,8 +857,8 @@ def main():
         if not df_cat.empty:
             # -------- Gráfico em barras (vermelho) --------
             df_cat_chart = df_cat.set_index("category")
-    
-          
+
+
             chart = (
                 alt.Chart(df_cat_chart.reset_index())
                 .mark_bar(color="#ff4d4d")  # barras vermelhas
@@ -780,18 +868,18 @@ def main():
                 )
                 .properties(height=350)
             )
-    
+
             st.altair_chart(chart, use_container_width=True)
-    
+
             # -------- Tabela formatada com % da renda --------
             df_cat_fmt = df_cat.copy()
-    
+
             # calcula percentual da renda para cada categoria
             if resumo["total_entrada"] > 0:
                 df_cat_fmt["percent_renda"] = (df_cat_fmt["amount"] / resumo["total_entrada"]) * 100
             else:
                 df_cat_fmt["percent_renda"] = 0.0
-    
+
             # renomeia colunas para exibição
             df_cat_fmt = df_cat_fmt.rename(
                 columns={
@@ -800,85 +888,42 @@ def main():
                     "percent_renda": "% da renda",
                 }
             )
-    
+
             # formata valores em R$ (pt-BR)
-            df_cat_fmt["Valor (R$)"] = df_cat_fmt["Valor (R$)"].apply(
-                lambda v: f"{v:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
-            )
-    
+            df_cat_fmt["Valor (R$)"] = format_brl_series(df_cat_fmt["Valor (R$)"], simbolo=False)
+
             # formata percentual usando a função que você já tem
             df_cat_fmt["% da renda"] = df_cat_fmt["% da renda"].apply(format_percent)
-    
+
             # remove índice numérico e reinicia para não aparecer a coluna de números
             df_cat_fmt = df_cat_fmt.reset_index(drop=True)
-    
+
             st.dataframe(df_cat_fmt, use_container_width=True, hide_index=True)
-    
+
         else:
             st.info("Não há despesas cadastradas neste mês.")
 
-        
+
     with col_g2:
         st.markdown("#### Histórico de 6 meses (Receitas x Despesas x Investimentos)")
-    
+
         if not df_hist.empty:
-            # =========================
-            # 0) NORMALIZA O PIVOT (ROBUSTO)
-            # =========================
-            df_pivot = df_hist.copy()
-            df_pivot.index = pd.to_datetime(df_pivot.index)
-            df_pivot = df_pivot.sort_index()
-    
-            # padroniza nomes vindos do pivot: entrada/saida/investimento -> Receitas/Despesas/Investimentos
-            df_pivot = df_pivot.rename(columns={
-                "entrada": "Receitas",
-                "saida": "Despesas",
-                "investimento": "Investimentos",
-            })
-    
-            # garante que as 3 colunas existam SEMPRE (mesmo que não haja dados no período)
-            for col in ["Receitas", "Despesas", "Investimentos"]:
-                if col not in df_pivot.columns:
-                    df_pivot[col] = 0.0
-    
-            # garante numérico e sem NaN
-            df_pivot[["Receitas", "Despesas", "Investimentos"]] = (
-                df_pivot[["Receitas", "Despesas", "Investimentos"]]
-                .apply(pd.to_numeric, errors="coerce")
-                .fillna(0.0)
-            )
-    
-            # mantém só as colunas do gráfico/tabela, na ordem desejada
-            df_pivot = df_pivot[["Receitas", "Despesas", "Investimentos"]]
-    
+            # compute_summary já devolve o pivot normalizado: índice "ym" (início do mês),
+            # colunas Receitas/Despesas/Investimentos e o rótulo "Mês" pré-formatado
+
             # =========================
             # 1) GRÁFICO
             # =========================
-            df_hist_chart = df_pivot.reset_index()
-    
-            # após reset_index, a coluna do índice pode ser "index" ou manter o nome
-            if "index" in df_hist_chart.columns and "ym" not in df_hist_chart.columns:
-                df_hist_chart = df_hist_chart.rename(columns={"index": "ym"})
-            elif "ym" not in df_hist_chart.columns:
-                df_hist_chart = df_hist_chart.rename(columns={df_hist_chart.columns[0]: "ym"})
-    
-            # normaliza para início do mês
-            df_hist_chart["ym"] = pd.to_datetime(df_hist_chart["ym"]).dt.to_period("M").dt.to_timestamp()
-    
-            df_long = df_hist_chart.melt(
+            df_long = df_hist.reset_index().melt(
                 id_vars="ym",
+                value_vars=HIST_COLUNAS,
                 var_name="Tipo",
                 value_name="Valor"
             )
-    
-            df_long["Valor"] = pd.to_numeric(df_long["Valor"], errors="coerce").fillna(0.0)
-    
-            # 1 ponto por mês/tipo
-            df_long = df_long.groupby(["ym", "Tipo"], as_index=False)["Valor"].sum()
-    
+
             # ticks exatamente nos meses existentes
-            meses = sorted(df_long["ym"].unique().tolist())
-    
+            meses = df_hist.index.tolist()
+
             chart_hist = (
                 alt.Chart(df_long)
                 .mark_line(point=True)
@@ -901,29 +946,24 @@ def main():
                 )
                 .properties(width="container", height=320)
             )
-    
+
             st.altair_chart(chart_hist, use_container_width=True)
-    
+
             # =========================
             # 2) TABELA RESUMO (MESMO PIVOT NORMALIZADO)
             # =========================
-            df_table_fmt = df_pivot.copy()
-    
-            for col in df_table_fmt.columns:
-                df_table_fmt[col] = df_table_fmt[col].apply(
-                    lambda v: f"R$ {v:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
-                )
-    
-            df_table_fmt = df_table_fmt.rename_axis("Mês").reset_index()
-            df_table_fmt["Mês"] = pd.to_datetime(df_table_fmt["Mês"]).dt.strftime("%m/%y")
-    
+            df_table_fmt = df_hist[["Mês"] + HIST_COLUNAS]
+            df_table_fmt = df_table_fmt.assign(
+                **{col: format_brl_series(df_table_fmt[col]) for col in HIST_COLUNAS}
+            )
+
             st.dataframe(df_table_fmt, use_container_width=True, hide_index=True)
-    
+
         else:
             st.info("Ainda não há dados suficientes para histórico.")
 
 
-            
+
         st.markdown("---")
 
     # ---------- ÚLTIMOS LANÇAMENTOS ----------
@@ -931,13 +971,14 @@ def main():
 
     if not df.empty:
 
+        # códigos inteiros do tipo, calculados uma vez para as 3 seleções abaixo
+        tipo_codes = pd.Index(TIPOS_LANCAMENTO).get_indexer(df["type"])
+
         # 🔹 função auxiliar para pegar últimos N de um tipo
         def get_last_n(df_base, tipo, n=10):
-            df_tipo = df_base[df_base["type"] == tipo].copy()
-            if df_tipo.empty:
-                return df_tipo
-            # ordena por data (mais recente primeiro) e pega N
-            return df_tipo.sort_values(by="date", ascending=False).head(n)
+            df_tipo = df_base[tipo_codes == TIPOS_LANCAMENTO.index(tipo)]
+            # N mais recentes (seleção parcial, sem ordenar o frame inteiro)
+            return df_tipo.nlargest(n, "date")
 
         # 🔹 últimos 10 de cada tipo
         df_ult_entrada = get_last_n(df, "entrada", 20)
@@ -955,37 +996,34 @@ def main():
             return
 
 
-        # Tabela para visualização (read-only), com data e valor formatados
-        df_view = df_sorted.copy()
-        df_view["date"] = df_view["date"].apply(lambda d: d.strftime("%d/%m/%Y"))
-
-        # renomeia colunas para exibição
-        df_view = df_view.rename(
-            columns={
-                "type": "Tipo",
-                "category": "Categoria",
-                "date": "Data",
-                "amount": "Valor (R$)",
-                "payment_type": "Forma",
-                "card_name": "Cartão",
-                "installments": "Parcelas",
-                "description": "Descrição",
-            }
-        )
+        edit_mode = st.checkbox("Habilitar edição dos últimos lançamentos")
 
-        # formata o valor em R$
-        df_view["Valor (R$)"] = df_view["Valor (R$)"].apply(
-            lambda v: f"{v:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
-        )
+        if not edit_mode:
+            # Tabela para visualização (read-only), com data e valor formatados;
+            # só é montada quando a edição está desligada
+            # renomeia colunas para exibição (rename já devolve um novo frame)
+            df_view = df_sorted.rename(
+                columns={
+                    "type": "Tipo",
+                    "category": "Categoria",
+                    "date": "Data",
+                    "amount": "Valor (R$)",
+                    "payment_type": "Forma",
+                    "card_name": "Cartão",
+                    "installments": "Parcelas",
+                    "description": "Descrição",
+                }
+            )
+            df_view["Data"] = df_view["Data"].dt.strftime("%d/%m/%Y")
 
-        # 🔹 escolhe explicitamente as colunas e ordem:
-        df_view = df_view[
-            ["Tipo", "Categoria", "Data", "Valor (R$)", "Forma", "Cartão", "Parcelas", "Descrição"]
-        ]
+            # formata o valor em R$
+            df_view["Valor (R$)"] = format_brl_series(df_view["Valor (R$)"], simbolo=False)
 
-        edit_mode = st.checkbox("Habilitar edição dos últimos lançamentos")
+            # 🔹 escolhe explicitamente as colunas e ordem:
+            df_view = df_view[
+                ["Tipo", "Categoria", "Data", "Valor (R$)", "Forma", "Cartão", "Parcelas", "Descrição"]
+            ]
 
-        if not edit_mode:
             # modo somente leitura, sem índice numérico
             st.dataframe(df_view, use_container_width=True, hide_index=True)
         else:
@@ -994,8 +1032,10 @@ def main():
             # DataFrame para edição (mantém valores numéricos e datas nativas)
             df_edit = df_sorted[
                 ["id", "type", "category", "date", "amount", "payment_type", "card_name", "installments", "description"]
-            ].copy()
-            
+            ]
+            # texto livre no editor (categóricas viram selectbox restrito às categorias existentes)
+            df_edit = df_edit.astype({"type": object, "category": object, "payment_type": object})
+
             df_edit = df_edit.rename(
                 columns={
                     "id": "ID",
@@ -1010,10 +1050,11 @@ def main():
                 }
             )
 
+            # guarda o valor numérico original para não reprocessar linhas não editadas
+            valor_original = df_edit["Valor"].astype(float)
+
             # 🔹 Formata o valor como texto BRL para edição (permite vírgula e ponto)
-            df_edit["Valor"] = df_edit["Valor"].apply(
-                lambda v: f"{float(v):,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
-            )
+            df_edit["Valor"] = format_brl_series(valor_original, simbolo=False)
 
             edited_df = st.data_editor(
                 df_edit,
@@ -1046,39 +1087,35 @@ def main():
                         "Parcelas": "installments",
                         "Descrição": "description",
                     }
-                ).copy()
+                )
 
                 # converte tipos
                 to_update["date"] = pd.to_datetime(to_update["date"]).dt.date.apply(lambda d: d.isoformat())
 
-                # 🔹 Converte string BRL para float usando sua função
-                to_update["amount"] = to_update["amount"].apply(parse_brl_to_float).astype(float)
+                # 🔹 Converte string BRL para float só nas linhas cujo valor foi editado;
+                #    as demais reaproveitam o float original
+                mask_valor_alterado = to_update["amount"] != df_edit["Valor"]
+                valores = valor_original.copy()
+                valores[mask_valor_alterado] = parse_brl_series(
+                    to_update.loc[mask_valor_alterado, "amount"]
+                )
+                to_update["amount"] = valores.astype(float)
                 to_update["installments"] = to_update["installments"].astype(int)
 
-                conn = get_connection()
-                cur = conn.cursor()
-                for _, row in to_update.iterrows():
-                    cur.execute(
-                        """
-                        UPDATE transactions
-                        SET type = %s, category = %s, date = %s, amount = %s,
-                            payment_type = %s, card_name = %s, installments = %s, description = %s
-                        WHERE id = %s
-                        """,
-                        (
-                            row["type"],
-                            row["category"],
-                            row["date"],
-                            row["amount"],
-                            row["payment_type"],
-                            row.get("card_name"),
-                            row["installments"],
-                            row.get("description"),
-                            int(row["id"]),
-                        ),
-                    )
-                conn.commit()
-                conn.close()
+                to_update["id"] = to_update["id"].astype(int)
+
+                # tuplas simples (tipos nativos do Python), na ordem dos %s do UPDATE
+                update_cols = [
+                    "type", "category", "date", "amount", "payment_type",
+                    "card_name", "installments", "description", "id",
+                ]
+                params = list(to_update[update_cols].itertuples(index=False, name=None))
+
+                with db_connection() as conn:
+                    cur = conn.cursor()
+                    # um único statement, enviado em lotes (poucas idas ao servidor)
+                    execute_batch(cur, _UPDATE_TX_SQL, params, page_size=100)
+                invalidate_data_cache()
 
                 st.success("Alterações salvas com sucesso!")
                 st.rerun()
@@ -1087,38 +1124,113 @@ def main():
         st.info("Nenhum lançamento cadastrado ainda.")
 
 
-# __________________________________________________________________________________________________________________________________________________________
+def main():
+    # você já chamou st.set_page_config lá em cima do arquivo;
+    st.set_page_config(
+        page_title="Controle Financeiro",
+        page_icon="💰",
+        layout="wide",
+        initial_sidebar_state="expanded",
+    )
+  
+    apply_custom_style()
+    init_db()
 
-def render_analises(df):
+    # 1) Se não estiver logado, chama tela de login/cadastro
+    user = login_screen()  # desenha login + criar conta
 
-    st.title("📊 Análises Financeiras")
-    st.markdown("Exploração avançada dos seus dados financeiros.")
+    if not user:
+        # Ainda não logou (primeiro acesso / preenchendo formulário)
+        st.stop()
 
-    if df.empty:
-        st.warning("Nenhum dado disponível para análise.")
+    # 2) Se chegou aqui, já está logado
+    user_id = user["id"]
+    user_email = user["email"]
+
+    # --- Navegação entre páginas ---
+    pagina = st.sidebar.radio(
+        "Navegação",
+        ["Dashboard", "Análises", "Tabelas", "Cartão de Crédito"],
+        horizontal=False
+    )
+
+    user_id = st.session_state["user_id"]
+
+    # Carrega dados uma única vez (para Dashboard e Análises)
+    df = load_data(user_id)
+
+    # 👉 Se for análises, chama render_analises e sai
+    if pagina == "Análises":
+        render_analises(df)
         return
 
-    # -------------------------
-    # 1️⃣ COMPARATIVO ANO vs ANO
-    # -------------------------
-    st.subheader("📅 Comparativo Ano a Ano")
+    # 👉 Se for consulta de tabelas, chama o módulo e não renderiza o dashboard
+    if pagina == "Tabelas":
+        pagina_consulta_tabelas(db_connection)
+        return
+    # 👉 Se for cartão de crédito, chama o módulo e não renderiza o dashboard
+    if pagina == "Cartão de Crédito":
+        pagina_cartao(df, db_connection, invalidate_data_cache)
+        return
+   
+    # --- SIDEBAR DO DASHBOARD ---
+    with st.sidebar:
+        st.header("Filtros")
+        today = date.today()
+        ref_date = st.date_input(
+            "Mês de referência",
+            value=today,
+            format="DD/MM/YYYY"
+        )
+       # st.markdown("---")
+    
+        novo_lancamento(user_id, today)
+
+    if "user_id" not in st.session_state:
+        st.error("Erro: usuário não autenticado. Volte para a tela de login.")
+        st.stop()
+
+    user_id = st.session_state["user_id"]
+
+    render_dashboard(user_id, ref_date)
+
+
+# __________________________________________________________________________________________________________________________________________________________
+
+@st.cache_data(show_spinner=False)
+def _format_brl_frame(d: pd.DataFrame, cols: tuple) -> pd.DataFrame:
+    """Aplica format_brl nas colunas indicadas; o resultado fica em cache."""
+    out = d.copy()
+    for c in cols:
+        out[c] = format_brl_series(out[c])
+    return out
 
-    df['year'] = pd.to_datetime(df['date']).dt.year
 
-    df_yoy = df.groupby(['year', 'type'])['amount'].sum().reset_index()
+@st.cache_data(show_spinner=False)
+def _analise_yoy(df: pd.DataFrame):
+    """
+    Agrega os valores por ano/tipo e monta o gráfico ano a ano.
+    Fica em cache enquanto os dados não mudarem.
+    """
+    tabela_yoy = pd.pivot_table(
+        df.assign(year=pd.to_datetime(df["date"]).dt.year),
+        index="year",
+        columns="type",
+        values="amount",
+        aggfunc="sum",
+        fill_value=0,
+        observed=True,
+    )
+
+    # formato longo (ano, tipo, valor) para o gráfico, derivado do mesmo pivot
+    df_yoy = tabela_yoy.stack().rename("amount").reset_index()
 
-    tabela_yoy = df_yoy.pivot(index="year", columns="type", values="amount").fillna(0)
     tabela_yoy = tabela_yoy.rename(columns={
         "entrada": "Receitas",
         "saida": "Despesas",
         "investimento": "Investimentos"
     })
 
-    # Formatação moeda
-    tabela_fmt = tabela_yoy.apply(lambda col: col.map(format_brl))
-    
-    st.dataframe(tabela_fmt, use_container_width=True)
-
     # Gráfico YOY (agrupado e responsivo)
     chart_yoy = (
         alt.Chart(df_yoy)
@@ -1142,8 +1254,111 @@ def render_analises(df):
             height=320
         )
     )
+
+    return tabela_yoy, chart_yoy.to_dict()
+
+
+@st.cache_data(show_spinner=False)
+def _analise_cartao_mensal(df_cc_ano: pd.DataFrame, ano_ref: int):
+    """Total mensal dos pagamentos de cartão no ano escolhido + gráfico."""
+    # 🔹 AGRUPA APENAS POR MÊS (TOTAL GERAL DO CARTÃO)
+    df_cc_mes = (
+        df_cc_ano.groupby(df_cc_ano["date"].dt.month.rename("mes"))["amount"]
+        .sum()
+        .reset_index()
+    )
+
+    # rótulo do mês (MM/AAAA)
+    df_cc_mes["mes_label"] = df_cc_mes["mes"].apply(
+        lambda m: f"{m:02d}/{ano_ref}"
+    )
+
+    chart_cc = (
+        alt.Chart(df_cc_mes)
+        .mark_bar()
+        .encode(
+            x=alt.X("mes_label:N", title="Mês",
+                   sort=["Jan", "Fev", "Mar", "Abr", "Mai", "Jun", "Jul", "Ago", "Set", "Out", "Nov", "Dez"]),
+            y=alt.Y("amount:Q", title="Total relacionado a cartão (R$)"),
+            tooltip=[
+                alt.Tooltip("mes_label:N", title="Mês"),
+                alt.Tooltip("amount:Q", title="Total", format=",.2f"),
+            ],
+        )
+        .properties(
+            width="container",
+            height=320,
+        )
+    )
+
+    return df_cc_mes, chart_cc.to_dict()
+
+
+@st.cache_data(show_spinner=False)
+def _analise_investimentos(df_inv: pd.DataFrame):
+    """Investido por ano + acumulado, com o gráfico de barras/linha."""
+    # Total investido em cada ano
+    df_inv_year = (
+        df_inv.groupby(pd.to_datetime(df_inv["date"]).dt.year.rename("year"))["amount"]
+        .sum()
+        .reset_index(name="investido_no_ano")
+        .sort_values("year")
+    )
+
+    # Acumulado ao longo dos anos
+    df_inv_year["investido_acumulado"] = df_inv_year["investido_no_ano"].cumsum()
+
+    # Barras: quanto foi investido em cada ano
+    # Linha: acumulado até aquele ano
+    base = alt.Chart(df_inv_year).encode(
+        x=alt.X("year:O", title="Ano")
+    )
+
+    barras = base.mark_bar().encode(
+        y=alt.Y("investido_no_ano:Q", title="Investido no ano (R$)"),
+        tooltip=[
+            alt.Tooltip("year:O", title="Ano"),
+            alt.Tooltip("investido_no_ano:Q", title="Investido no ano"),
+            alt.Tooltip("investido_acumulado:Q", title="Acumulado até o ano"),
+        ],
+    )
+
+    linha = base.mark_line(point=True, color="#60a5fa").encode(
+        y=alt.Y("investido_acumulado:Q", title="Acumulado (R$)"),
+    )
+
+    chart_inv = alt.layer(barras, linha).resolve_scale(
+        y="independent"
+    ).properties(
+        width="container",
+        height=320
+    )
+
+    return df_inv_year, chart_inv.to_dict()
+
+
+def render_analises(df):
+
+    st.title("📊 Análises Financeiras")
+    st.markdown("Exploração avançada dos seus dados financeiros.")
+
+    if df.empty:
+        st.warning("Nenhum dado disponível para análise.")
+        return
+
+    # -------------------------
+    # 1️⃣ COMPARATIVO ANO vs ANO
+    # -------------------------
+    st.subheader("📅 Comparativo Ano a Ano")
+
+    tabela_yoy, chart_yoy = _analise_yoy(df)
+
+    # Formatação moeda
+    tabela_fmt = _format_brl_frame(tabela_yoy, tuple(tabela_yoy.columns))
     
-    st.altair_chart(chart_yoy, use_container_width=True)
+    st.dataframe(tabela_fmt, use_container_width=True)
+
+    st.vega_lite_chart(chart_yoy, use_container_width=True)
 
     st.markdown("---")
 
@@ -1152,32 +1367,31 @@ def render_analises(df):
     # ----------------------------
     st.subheader("💳 Gastos com pagamento de cartão (mensal)")
 
-    # Normaliza categoria para comparar em minúsculas
-    df_temp = df.copy()
-    df_temp["category_norm"] = (
-        df_temp["category"]
-        .astype(str)
-        .str.strip()
-        .str.lower()
-    )
+    # Normaliza categoria para comparar em minúsculas (sem copiar o df inteiro)
+    category_norm = df["category"].astype(str).str.strip().str.lower()
 
     # Filtra:
-    #  - saídas com forma de pagamento "Cartão de crédito"
-    #  OU
-    #  - saídas cuja categoria é "Pagamento de Cartão"
-    df_cc = df_temp[
-        (df_temp["type"] == "saida") & (
-            (df_temp["payment_type"] == "Conta") &
-            (df_temp["category_norm"] == "pagamento de cartão")
-        )
-    ].copy()
+    #  - saídas pagas pela conta
+    #  E
+    #  - cuja categoria é "Pagamento de Cartão"
+    mask_cc = (
+        (df["type"] == "saida")
+        & (df["payment_type"] == "Conta")
+        & (category_norm == "pagamento de cartão")
+    )
 
-    if df_cc.empty:
+    if not mask_cc.any():
         st.info("Não há lançamentos relacionados a cartão de crédito para análise ainda.")
     else:
-        # Garante tipo datetime e cria coluna de ano
-        df_cc["date"] = pd.to_datetime(df_cc["date"])
-        df_cc["year"] = df_cc["date"].dt.year
+        # Uma única seleção com as colunas derivadas (data/ano) já prontas
+        datas_cc = pd.to_datetime(df.loc[mask_cc, "date"])
+        df_cc = pd.DataFrame(
+            {
+                "date": datas_cc,
+                "amount": df.loc[mask_cc, "amount"],
+                "year": datas_cc.dt.year,
+            }
+        )
 
         # Lista de anos disponíveis (mais recente primeiro)
         anos_disponiveis = sorted(df_cc["year"].unique(), reverse=True)
@@ -1194,58 +1408,24 @@ def render_analises(df):
         )
 
         # Filtra apenas o ano escolhido
-        df_cc_ano = df_cc[df_cc["year"] == ano_ref].copy()
+        # df_cc herda a ordenação por data de load_data: o ano é uma fatia contígua
+        df_cc_ano = slice_by_date(
+            df_cc[["date", "amount"]], date(int(ano_ref), 1, 1), date(int(ano_ref), 12, 31)
+        )
 
         if df_cc_ano.empty:
             st.info(f"Não há gastos com cartão de crédito em {ano_ref}.")
         else:
-            # mês numérico
-            df_cc_ano["mes"] = df_cc_ano["date"].dt.month
-
-            # 🔹 AGRUPA APENAS POR MÊS (TOTAL GERAL DO CARTÃO)
-            df_cc_mes = (
-                df_cc_ano.groupby("mes")["amount"]
-                .sum()
-                .reset_index()
-            )
-
-            # rótulo do mês (MM/AAAA)
-            df_cc_mes["mes_label"] = df_cc_mes["mes"].apply(
-                lambda m: f"{m:02d}/{ano_ref}"
-            )
+            df_cc_mes, chart_cc = _analise_cartao_mensal(df_cc_ano, int(ano_ref))
 
             # ---------- GRÁFICO ----------
-            chart_cc = (
-                alt.Chart(df_cc_mes)
-                .mark_bar()
-                .encode(
-                    x=alt.X("mes_label:N", title="Mês",
-                           sort=["Jan", "Fev", "Mar", "Abr", "Mai", "Jun", "Jul", "Ago", "Set", "Out", "Nov", "Dez"]),
-                    y=alt.Y("amount:Q", title="Total relacionado a cartão (R$)"),
-                    tooltip=[
-                        alt.Tooltip("mes_label:N", title="Mês"),
-                        alt.Tooltip("amount:Q", title="Total", format=",.2f"),
-                    ],
-                )
-                .properties(
-                    width="container",
-                    height=320,
-                )
-            )
-
-            st.altair_chart(chart_cc, use_container_width=True)
+            st.vega_lite_chart(chart_cc, use_container_width=True)
 
             # ---------- TABELA RESUMO ----------
-            tabela_cc = df_cc_mes[["mes_label", "amount"]].copy()
-            tabela_cc["Total (R$)"] = tabela_cc["amount"].apply(
-                lambda v: f"R$ {v:,.2f}"
-                .replace(",", "X")
-                .replace(".", ",")
-                .replace("X", ".")
+            tabela_cc = df_cc_mes[["mes_label", "amount"]].rename(
+                columns={"mes_label": "Mês", "amount": "Total (R$)"}
             )
-
-            tabela_cc = tabela_cc.rename(columns={"mes_label": "Mês"})
-            tabela_cc = tabela_cc[["Mês", "Total (R$)"]]
+            tabela_cc = _format_brl_frame(tabela_cc, ("Total (R$)",))
 
             st.dataframe(tabela_cc, use_container_width=True)
 
@@ -1258,66 +1438,29 @@ def render_analises(df):
     st.subheader("📈 Evolução do patrimônio investido (ano a ano)")
 
     # Filtra somente os lançamentos de investimento
-    df_inv = df[df["type"] == "investimento"].copy()
+    df_inv = df[df["type"] == "investimento"]
 
     if df_inv.empty:
         st.info("Ainda não há lançamentos de investimento para montar a evolução.")
     else:
-        # Ano de cada investimento
-        df_inv["year"] = pd.to_datetime(df_inv["date"]).dt.year
-
-        # Total investido em cada ano
-        df_inv_year = (
-            df_inv.groupby("year")["amount"]
-            .sum()
-            .reset_index(name="investido_no_ano")
-            .sort_values("year")
-        )
-
-        # Acumulado ao longo dos anos
-        df_inv_year["investido_acumulado"] = df_inv_year["investido_no_ano"].cumsum()
+        df_inv_year, chart_inv = _analise_investimentos(df_inv[["date", "amount"]])
 
         # ----- TABELA FORMATADA -----
-        df_inv_view = df_inv_year.copy()
-        df_inv_view["Ano"] = df_inv_view["year"].astype(int)
-        df_inv_view["Investido no ano (R$)"] = df_inv_view["investido_no_ano"].apply(
-            lambda v: f"R$ {v:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+        df_inv_view = pd.DataFrame(
+            {
+                "Ano": df_inv_year["year"].astype(int),
+                "Investido no ano (R$)": df_inv_year["investido_no_ano"],
+                "Acumulado investido (R$)": df_inv_year["investido_acumulado"],
+            }
         )
-        df_inv_view["Acumulado investido (R$)"] = df_inv_view["investido_acumulado"].apply(
-            lambda v: f"R$ {v:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+        df_inv_view = _format_brl_frame(
+            df_inv_view, ("Investido no ano (R$)", "Acumulado investido (R$)")
         )
-        df_inv_view = df_inv_view[["Ano", "Investido no ano (R$)", "Acumulado investido (R$)"]]
 
         st.dataframe(df_inv_view, use_container_width=True)
 
         # ----- GRÁFICO ANO A ANO -----
-        # Barras: quanto foi investido em cada ano
-        # Linha: acumulado até aquele ano
-        base = alt.Chart(df_inv_year).encode(
-            x=alt.X("year:O", title="Ano")
-        )
-
-        barras = base.mark_bar().encode(
-            y=alt.Y("investido_no_ano:Q", title="Investido no ano (R$)"),
-            tooltip=[
-                alt.Tooltip("year:O", title="Ano"),
-                alt.Tooltip("investido_no_ano:Q", title="Investido no ano"),
-                alt.Tooltip("investido_acumulado:Q", title="Acumulado até o ano"),
-            ],
-        )
-
-        linha = base.mark_line(point=True, color="#60a5fa").encode(
-            y=alt.Y("investido_acumulado:Q", title="Acumulado (R$)"),
-        )
-
-        chart_inv = alt.layer(barras, linha).resolve_scale(
-            y="independent"
-        ).properties(
-            width="container",
-            height=320
-        )
-
-        st.altair_chart(chart_inv, use_container_width=True)
+        st.vega_lite_chart(chart_inv, use_container_width=True)
 
 
 if __name__ == "__main__":
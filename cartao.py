@@ -1,58 +1,54 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import altair as alt
 from datetime import date
-from dateutil.relativedelta import relativedelta
-import psycopg2
+from psycopg2.extras import execute_batch
 
 
 # -------------------------------------------------------------------
-# CONEXÃO COM BANCO / UPDATE DE TRANSAÇÕES
+# UPDATE DE TRANSAÇÕES
 # -------------------------------------------------------------------
 
-def get_connection():
-    """
-    Abre conexão com o banco (Supabase/Postgres) usando st.secrets,
-    no mesmo padrão do controle.py.
-    """
-    dsn = st.secrets["supabase_db"]["url"]
-    conn = psycopg2.connect(dsn, sslmode="require")
-    return conn
+_UPDATE_FIELDS_SQL = """
+    UPDATE transactions
+       SET category = %s,
+           card_name = %s,
+           description = %s
+     WHERE id = %s
+"""
 
 
-def update_transaction_fields(
-    transaction_id: int,
-    new_category: str,
-    new_card_name: str,
-    new_description: str,
-):
+def update_transactions_fields(db_connection, invalidate_data_cache, alteracoes):
     """
-    Atualiza apenas campos de alto nível da transação original:
-    - categoria
-    - card_name
-    - descrição
+    Atualiza apenas campos de alto nível das transações originais
+    (categoria, card_name, descrição), todas numa única transação.
+
+    db_connection: context manager do controle.py que empresta uma conexão do pool.
+    invalidate_data_cache: função do controle.py que descarta load_data e os resumos.
+    alteracoes: lista de tuplas (categoria, card_name, descrição, id).
     """
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        UPDATE transactions
-           SET category = %s,
-               card_name = %s,
-               description = %s
-         WHERE id = %s
-        """,
-        (new_category, new_card_name, new_description, transaction_id),
-    )
-    conn.commit()
-    cur.close()
-    conn.close()
+    with db_connection() as conn:
+        cur = conn.cursor()
+        execute_batch(cur, _UPDATE_FIELDS_SQL, alteracoes, page_size=100)
+    # invalida só os caches afetados: load_data/resumos (controle.py) e os do cartão
+    invalidate_data_cache()
+    expand_installments.clear()
+    compute_card_summary.clear()
+    build_purchase_overview.clear()
 
 
 # -------------------------------------------------------------------
 # FUNÇÕES DE APOIO
 # -------------------------------------------------------------------
 
+NOMES_MESES = ["Jan", "Fev", "Mar", "Abr", "Mai", "Jun", "Jul", "Ago", "Set", "Out", "Nov", "Dez"]
+
+# colunas que expand_installments realmente lê (projeção menor = hash de cache mais barato)
+EXPAND_COLS = ["id", "date", "amount", "installments", "card_name", "category", "description"]
+
+
+@st.cache_data(ttl=300, show_spinner=False)
 def expand_installments(df: pd.DataFrame, due_day: int) -> pd.DataFrame:
     """
     Expande cada compra parcelada em uma linha por parcela, com data de vencimento calculada.
@@ -61,46 +57,47 @@ def expand_installments(df: pd.DataFrame, due_day: int) -> pd.DataFrame:
     - Se o dia da compra <= dia de vencimento -> 1ª parcela vence neste mês.
     - Se o dia da compra >  dia de vencimento -> 1ª parcela vence no mês seguinte.
     """
-    rows = []
-    for _, row in df.iterrows():
-        purchase_date = row["date"]
-        n_parc = int(row["installments"])
-        total_value = float(row["amount"])
-
-        n_parc = max(n_parc, 1)
-        parcela_value = total_value / n_parc
-
-        if purchase_date.day <= due_day:
-            first_due = purchase_date.replace(day=due_day)
-        else:
-            first_due = (purchase_date + relativedelta(months=1)).replace(day=due_day)
-
-        for k in range(1, n_parc + 1):
-            due_date = first_due + relativedelta(months=k - 1)
-
-            rows.append(
-                {
-                    "transaction_id": row["id"],
-                    "category": row["category"],
-                    "purchase_date": purchase_date,
-                    "card_name": row["card_name"],
-                    "description": row["description"],
-                    "installment_no": k,
-                    "total_installments": n_parc,
-                    "installment_value": parcela_value,
-                    "due_date": due_date,
-                }
-            )
-
-    if not rows:
+    if df.empty:
         return pd.DataFrame()
 
-    out = pd.DataFrame(rows)
-    out["due_date"] = pd.to_datetime(out["due_date"]).dt.date
+    n_parc = np.maximum(df["installments"].to_numpy(dtype=np.int64), 1)
+    total_value = df["amount"].to_numpy(dtype="float64")
+
+    # aritmética de meses em datetime64[M], sem laço linha a linha
+    purchase_days = pd.to_datetime(df["date"]).to_numpy(dtype="datetime64[D]")
+    purchase_months = purchase_days.astype("datetime64[M]")
+    purchase_day_no = (purchase_days - purchase_months.astype("datetime64[D]")).astype(np.int64) + 1
+    first_due_month = purchase_months + (purchase_day_no > due_day).astype(np.int64)
+
+    # uma linha por parcela: repete a compra n_parc vezes e numera 0..n-1
+    idx = np.repeat(np.arange(len(df)), n_parc)
+    k = np.arange(n_parc.sum()) - np.repeat(np.cumsum(n_parc) - n_parc, n_parc)
+    due_month = first_due_month[idx] + k
+    # ano/mês do vencimento calculados uma vez (meses desde 1970 -> ano, mês)
+    due_year_no, due_month_no = np.divmod(due_month.astype(np.int64), 12)
+
+    out = pd.DataFrame(
+        {
+            "transaction_id": df["id"].to_numpy()[idx],
+            # .array.take preserva o dtype categórico
+            "category": df["category"].array.take(idx),
+            "purchase_date": df["date"].to_numpy()[idx],
+            "card_name": df["card_name"].array.take(idx),
+            "description": df["description"].to_numpy()[idx],
+            "installment_no": k + 1,
+            "total_installments": n_parc[idx],
+            "installment_value": (total_value / n_parc)[idx],
+            # mantém datetime64 (máscaras de ano/mês ficam vetorizadas)
+            "due_date": due_month.astype("datetime64[D]") + (due_day - 1),
+            "due_year": (due_year_no + 1970).astype(np.int16),
+            "due_month": (due_month_no + 1).astype(np.int8),
+        }
+    )
     return out
 
 
-def compute_card_summary(expanded: pd.DataFrame):
+@st.cache_data(ttl=300, show_spinner=False)
+def compute_card_summary(expanded: pd.DataFrame, hoje: date):
     """
     Retorna:
     - valor_fatura_mes: total de parcelas que vencem no mês atual
@@ -110,27 +107,29 @@ def compute_card_summary(expanded: pd.DataFrame):
     if expanded.empty:
         return 0.0, 0.0, 0.0
 
-    today = date.today()
-    current_year = today.year
-    current_month = today.month
+    today = np.datetime64(hoje, "D")
+    due = expanded["due_date"].to_numpy(dtype="datetime64[D]")
+    valores = expanded["installment_value"].to_numpy(dtype="float64")
 
-    mask_mes_atual = expanded["due_date"].apply(
-        lambda d: d.year == current_year and d.month == current_month
-    )
-    valor_fatura_mes = expanded.loc[mask_mes_atual, "installment_value"].sum()
-
-    mask_ano_atual = expanded["due_date"].apply(lambda d: d.year == current_year)
-
-    mask_pago = mask_ano_atual & (expanded["due_date"] < today)
-    valor_pago_ano = expanded.loc[mask_pago, "installment_value"].sum()
+    # cada parcela cai num balde (ano/mês já pré-calculados em expand_installments):
+    #   0 = fora do ano atual
+    #   1 = ano atual, já vencida      2 = ano atual, a vencer
+    #   3 = mês atual, já vencida      4 = mês atual, a vencer
+    # e uma única passada soma todos os baldes
+    no_ano = expanded["due_year"].to_numpy() == hoje.year
+    no_mes = no_ano & (expanded["due_month"].to_numpy() == hoje.month)
+    balde = no_ano * (1 + (due >= today)) + 2 * no_mes
+    somas = np.bincount(balde, weights=valores, minlength=5)
 
-    mask_a_pagar = mask_ano_atual & (expanded["due_date"] >= today)
-    divida_ano_a_pagar = expanded.loc[mask_a_pagar, "installment_value"].sum()
+    valor_fatura_mes = somas[3] + somas[4]
+    valor_pago_ano = somas[1] + somas[3]
+    divida_ano_a_pagar = somas[2] + somas[4]
 
     return valor_fatura_mes, divida_ano_a_pagar, valor_pago_ano
 
 
-def build_purchase_overview(expanded: pd.DataFrame) -> pd.DataFrame:
+@st.cache_data(ttl=300, show_spinner=False)
+def build_purchase_overview(expanded: pd.DataFrame, hoje: date) -> pd.DataFrame:
     """
     Consolida por COMPRA (transaction_id), calculando:
       - status: 'ativa' ou 'concluida'
@@ -142,64 +141,110 @@ def build_purchase_overview(expanded: pd.DataFrame) -> pd.DataFrame:
     if expanded.empty:
         return pd.DataFrame()
 
-    today = date.today()
-    rows = []
-
-    for tid, g in expanded.groupby("transaction_id", dropna=False):
-        g = g.sort_values("installment_no")
-        total_installments = int(g["total_installments"].iloc[0])
-        parcela_value = float(g["installment_value"].iloc[0])
-        dues = g["due_date"].tolist()
+    today = np.datetime64(hoje, "D")
+
+    # ordena uma vez por compra (estável: mantém as parcelas em ordem) e
+    # reduz cada bloco contíguo com reduceat, sem laço por grupo
+    tid = expanded["transaction_id"].to_numpy()
+    order = np.argsort(tid, kind="stable")
+    tid = tid[order]
+    starts = np.flatnonzero(np.r_[True, tid[1:] != tid[:-1]])
+    first_rows = order[starts]
+
+    due = expanded["due_date"].to_numpy(dtype="datetime64[D]")[order]
+    vencidas = due < today
+
+    total_installments = expanded["total_installments"].to_numpy()[first_rows]
+    parcela_value = expanded["installment_value"].to_numpy(dtype="float64")[first_rows]
+
+    paid = np.add.reduceat(vencidas.astype(np.int64), starts)
+    remaining = total_installments - paid
+    last_due = np.maximum.reduceat(due, starts)
+
+    # próximo vencimento: menor data ainda não vencida (NaT se não houver)
+    sem_vencimento = np.datetime64("9999-12-31")
+    next_due = np.minimum.reduceat(np.where(vencidas, sem_vencimento, due), starts)
+    next_due = np.where((remaining > 0) & (next_due != sem_vencimento), next_due, np.datetime64("NaT"))
+
+    status = np.where((remaining <= 0) & (last_due < today), "concluida", "ativa")
+
+    firsts = expanded.iloc[first_rows]
+    return pd.DataFrame(
+        {
+            "transaction_id": tid[starts],
+            "card_name": firsts["card_name"].array,
+            "category": firsts["category"].array,
+            "purchase_date": firsts["purchase_date"].to_numpy(),
+            # ano da compra já extraído (opções e filtro de ano reaproveitam do cache)
+            "purchase_year": firsts["purchase_date"].dt.year.to_numpy(),
+            "total_installments": total_installments,
+            "installments_paid": paid,
+            "installments_remaining": remaining,
+            "total_value": total_installments * parcela_value,
+            "remaining_value": np.maximum(0, remaining * parcela_value),
+            "next_due": pd.to_datetime(next_due),
+            "description": firsts["description"].to_numpy(),
+            "status": status,
+            # descrição já minúscula para a busca (não é exibida)
+            "description_lower": firsts["description"].fillna("").str.lower().to_numpy(),
+        }
+    )
 
-        paid = sum(1 for d in dues if d < today)
-        remaining = total_installments - paid
-        last_due = max(dues)
 
-        if remaining <= 0 and last_due < today:
-            status = "concluida"
-        else:
-            status = "ativa"
-
-        next_due = None
-        if remaining > 0:
-            future_dues = [d for d in dues if d >= today]
-            next_due = min(future_dues) if future_dues else None
-
-        total_value = total_installments * parcela_value
-        remaining_value = max(0, remaining * parcela_value)
-
-        rows.append(
-            {
-                "transaction_id": tid,
-                "card_name": g["card_name"].iloc[0],
-                "category": g["category"].iloc[0],
-                "purchase_date": g["purchase_date"].iloc[0],
-                "total_installments": total_installments,
-                "installments_paid": paid,
-                "installments_remaining": remaining,
-                "total_value": total_value,
-                "remaining_value": remaining_value,
-                "next_due": next_due,
-                "description": g["description"].iloc[0],
-                "status": status,
-            }
+def coletar_alteracoes(original: pd.DataFrame, editado: pd.DataFrame) -> list:
+    """
+    Compara as colunas editáveis (Cartão, Categoria, Descrição) de uma vez
+    e devolve as tuplas (categoria, cartão, descrição, id) das linhas alteradas,
+    no formato esperado por update_transactions_fields.
+    """
+    cols = ["Cartão", "Categoria", "Descrição"]
+    antes = original.set_index("ID")[cols]
+    depois = editado.set_index("ID").loc[antes.index, cols]
+
+    # vazio dos dois lados (None/NaN) não conta como alteração
+    iguais = (antes == depois) | (antes.isna() & depois.isna())
+    alteradas = depois[~iguais.to_numpy().all(axis=1)].astype(object)
+    alteradas = alteradas.where(alteradas.notna(), None)
+    return list(
+        zip(
+            alteradas["Categoria"],
+            alteradas["Cartão"],
+            alteradas["Descrição"],
+            map(int, alteradas.index),
         )
+    )
+
 
-    return pd.DataFrame(rows)
+# troca "," <-> "." numa única passada (padrão brasileiro)
+_BRL_TABLE = str.maketrans({",": ".", ".": ","})
 
 
 def format_brl(v: float) -> str:
-    return f"R$ {v:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+    return f"R$ {v:,.2f}".translate(_BRL_TABLE)
+
+
+def format_brl_series(valores: pd.Series) -> pd.Series:
+    """
+    format_brl aplicado a uma coluna inteira (mesmo arredondamento dos cards);
+    valores vazios viram "".
+    """
+    textos = [
+        "" if np.isnan(v) else format_brl(v)
+        for v in valores.to_numpy(dtype="float64").tolist()
+    ]
+    return pd.Series(textos, index=valores.index, dtype=object)
 
 
 # -------------------------------------------------------------------
 # PÁGINA PRINCIPAL DO MÓDULO DE CARTÃO
 # -------------------------------------------------------------------
 
-def pagina_cartao(df: pd.DataFrame):
+def pagina_cartao(df: pd.DataFrame, db_connection, invalidate_data_cache):
     """
     df vem do controle.py (já filtrado por user_id em load_data).
     Aqui só filtramos as despesas pagas com cartão e montamos o módulo.
+    db_connection: context manager do controle.py usado para gravar as edições.
+    invalidate_data_cache: função do controle.py chamada depois de gravar.
     """
     st.markdown("### 💳 Módulo de Cartão de Crédito")
 
@@ -207,29 +252,33 @@ def pagina_cartao(df: pd.DataFrame):
         st.info("Ainda não há lançamentos para este usuário.")
         return
 
-    df = df.copy()
-    df["date"] = pd.to_datetime(df["date"]).dt.date
-
-    if "installments" not in df.columns:
-        df["installments"] = 1
-    if "card_name" not in df.columns:
-        df["card_name"] = ""
-    if "description" not in df.columns:
-        df["description"] = ""
-
-    df["installments"] = df["installments"].fillna(1).astype(int)
-    df["amount"] = df["amount"].astype(float)
-
-    # Apenas saídas pagas com cartão de crédito
+    # Apenas saídas pagas com cartão de crédito (filtra antes de normalizar,
+    # assim só o subconjunto do cartão é convertido, sem copiar o df inteiro)
     df_cartao = df[
         (df["type"] == "saida") &
         (df["payment_type"] == "Cartão de crédito")
-    ].copy()
+    ]
 
     if df_cartao.empty:
         st.info("Ainda não há despesas lançadas com cartão de crédito.")
         return
 
+    for col, padrao in {"installments": 1, "card_name": "", "description": ""}.items():
+        if col not in df_cartao.columns:
+            df_cartao = df_cartao.assign(**{col: padrao})
+
+    # um único assign normaliza o subconjunto (uma cópia só)
+    df_cartao = df_cartao.assign(
+        date=pd.to_datetime(df_cartao["date"]),
+        installments=df_cartao["installments"].fillna(1).astype(int),
+        amount=df_cartao["amount"].astype(float),
+        # colunas de baixa cardinalidade como categóricas: filtros e groupby
+        # comparam códigos inteiros em vez de strings
+        # (sem categorias órfãs: as categorias viram as opções dos filtros)
+        category=df_cartao["category"].astype("category").cat.remove_unused_categories(),
+        card_name=df_cartao["card_name"].astype("category").cat.remove_unused_categories(),
+    )
+
     # Configuração: dia de vencimento
     st.sidebar.markdown("### Configurações do cartão")
     due_day = st.sidebar.slider(
@@ -240,12 +289,15 @@ def pagina_cartao(df: pd.DataFrame):
         help="Assumimos que todas as faturas vencem neste dia do mês.",
     )
 
-    expanded = expand_installments(df_cartao, due_day)
+    # em cache: só recalcula se as compras ou o dia de vencimento mudarem
+    expanded = expand_installments(df_cartao[EXPAND_COLS], due_day)
 
     # -------------------------------------------------------------------
     # CARDS DE RESUMO
     # -------------------------------------------------------------------
-    valor_fatura_mes, divida_ano_a_pagar, valor_pago_ano = compute_card_summary(expanded)
+    # "hoje" entra na chave do cache: resumo e visão por compra viram o dia sozinhos
+    hoje = date.today()
+    valor_fatura_mes, divida_ano_a_pagar, valor_pago_ano = compute_card_summary(expanded, hoje)
 
     col1, col2, col3 = st.columns(3)
     col1.metric(
@@ -268,12 +320,12 @@ def pagina_cartao(df: pd.DataFrame):
     # -------------------------------------------------------------------
     st.subheader("Categorias mais gastas no cartão (ano atual)")
 
-    current_year = date.today().year
-    df_year = df_cartao[df_cartao["date"].apply(lambda d: d.year == current_year)]
+    current_year = hoje.year
+    df_year = df_cartao[df_cartao["date"].dt.year == current_year]
 
     if not df_year.empty:
         cat_totais = (
-            df_year.groupby("category")["amount"]
+            df_year.groupby("category", observed=True)["amount"]
             .sum()
             .reset_index()
             .rename(columns={"amount": "total"})
@@ -300,7 +352,7 @@ def pagina_cartao(df: pd.DataFrame):
 
         st.markdown("#### Participação de cada categoria no total de despesas com cartão")
         cat_view = cat_totais.copy()
-        cat_view["total"] = cat_view["total"].map(format_brl)
+        cat_view["total"] = format_brl_series(cat_view["total"])
         cat_view["percentual"] = cat_view["percentual"].map(lambda v: f"{v:.2f}%")
         st.dataframe(cat_view, use_container_width=True)
     else:
@@ -314,34 +366,18 @@ def pagina_cartao(df: pd.DataFrame):
     st.subheader("Histórico anual de uso do cartão (por vencimento)")
 
     if not expanded.empty:
-        this_year = date.today().year
-        exp_year = expanded[expanded["due_date"].apply(lambda d: d.year == this_year)]
+        this_year = hoje.year
+        exp_year = expanded[expanded["due_year"].to_numpy() == this_year]
 
         if not exp_year.empty:
-            exp_year["mes"] = exp_year["due_date"].apply(lambda d: d.month)
-            mensal = (
-                exp_year.groupby("mes")["installment_value"]
-                .sum()
-                .reindex(range(1, 13), fill_value=0)
-                .reset_index()
-                .rename(columns={"mes": "Mês", "installment_value": "Fatura"})
-            )
-
-            mensal["NomeMes"] = mensal["Mês"].map(
-                {
-                    1: "Jan",
-                    2: "Fev",
-                    3: "Mar",
-                    4: "Abr",
-                    5: "Mai",
-                    6: "Jun",
-                    7: "Jul",
-                    8: "Ago",
-                    9: "Set",
-                    10: "Out",
-                    11: "Nov",
-                    12: "Dez",
-                }
+            # 12 posições fixas: soma ponderada por mês numa única passada
+            faturas = np.bincount(
+                exp_year["due_month"].to_numpy(dtype=np.intp),
+                weights=exp_year["installment_value"].to_numpy(dtype="float64"),
+                minlength=13,
+            )[1:]
+            mensal = pd.DataFrame(
+                {"Mês": np.arange(1, 13), "Fatura": faturas, "NomeMes": NOMES_MESES}
             )
 
             chart_hist = (
@@ -351,20 +387,7 @@ def pagina_cartao(df: pd.DataFrame):
                     x=alt.X(
                         "NomeMes:N",
                         title="Mês",
-                        sort=[
-                            "Jan",
-                            "Fev",
-                            "Mar",
-                            "Abr",
-                            "Mai",
-                            "Jun",
-                            "Jul",
-                            "Ago",
-                            "Set",
-                            "Out",
-                            "Nov",
-                            "Dez",
-                        ],
+                        sort=NOMES_MESES,
                     ),
                     y=alt.Y("Fatura:Q", title="Valor (R$)"),
                     tooltip=[
@@ -390,7 +413,7 @@ def pagina_cartao(df: pd.DataFrame):
         st.info("Não há dívidas de cartão registradas.")
         return
 
-    compras = build_purchase_overview(expanded)
+    compras = build_purchase_overview(expanded, hoje)
 
     if compras.empty:
         st.info("Nenhuma compra com cartão encontrada.")
@@ -399,9 +422,12 @@ def pagina_cartao(df: pd.DataFrame):
     # -------------------------
     # Filtros
     # -------------------------
-    cartoes = sorted(compras["card_name"].dropna().unique().tolist())
-    categorias = sorted(compras["category"].dropna().unique().tolist())
-    anos = sorted({d.year for d in compras["purchase_date"]})
+    # categorias do dtype categórico já são os valores distintos (sem NaN)
+    cartoes = sorted(compras["card_name"].cat.categories.tolist())
+    categorias = sorted(compras["category"].cat.categories.tolist())
+    # ano da compra pré-calculado (e em cache) em build_purchase_overview
+    anos_compra = compras["purchase_year"].to_numpy()
+    anos = np.unique(anos_compra).tolist()
 
     with st.form("filtros_dividas_cartao"):
         col_f1, col_f2, col_f3, col_f4 = st.columns(4)
@@ -435,27 +461,28 @@ def pagina_cartao(df: pd.DataFrame):
 
         aplicar = st.form_submit_button("Aplicar filtros")
 
-    compras_filt = compras.copy()
+    # filtros acumulam uma única máscara sobre compras (uma seleção no fim, sem cópias)
+    mask_filtro = np.ones(len(compras), dtype=bool)
 
     if card_sel != "Todos":
-        compras_filt = compras_filt[compras_filt["card_name"] == card_sel]
+        mask_filtro &= (compras["card_name"] == card_sel).to_numpy()
 
     if cat_sel != "Todas":
-        compras_filt = compras_filt[compras_filt["category"] == cat_sel]
+        mask_filtro &= (compras["category"] == cat_sel).to_numpy()
 
     if ano_sel != "Todos":
-        compras_filt = compras_filt[
-            compras_filt["purchase_date"].apply(lambda d: d.year == int(ano_sel))
-        ]
+        mask_filtro &= anos_compra == int(ano_sel)
 
     if texto_busca:
-        compras_filt = compras_filt[
-            compras_filt["description"].fillna("").str.contains(texto_busca, case=False, na=False)
-        ]
+        # busca literal (regex=False) sobre a coluna já minúscula
+        mask_filtro &= (
+            compras["description_lower"].str.contains(texto_busca.lower(), regex=False).to_numpy()
+        )
 
     # Separa ativas e concluídas (100% pagas)
-    df_ativas = compras_filt[compras_filt["status"] == "ativa"].copy()
-    df_concluidas = compras_filt[compras_filt["status"] == "concluida"].copy()
+    ativa = (compras["status"] == "ativa").to_numpy()
+    df_ativas = compras[mask_filtro & ativa]
+    df_concluidas = compras[mask_filtro & ~ativa]
 
     if status_sel == "Ativas":
         mostrar_ativas = True
@@ -481,14 +508,13 @@ def pagina_cartao(df: pd.DataFrame):
             st.write("✔️ Nenhuma dívida ativa encontrada com os filtros selecionados.")
         else:
             df_view_ativas = df_ativas.copy()
-            df_view_ativas["Data da compra"] = df_view_ativas["purchase_date"].apply(
-                lambda d: d.strftime("%d/%m/%Y")
+            df_view_ativas["Data da compra"] = df_view_ativas["purchase_date"].dt.strftime("%d/%m/%Y")
+            # NaT (sem próximo vencimento) vira "-"
+            df_view_ativas["Próximo vencimento"] = (
+                df_view_ativas["next_due"].dt.strftime("%d/%m/%Y").fillna("-")
             )
-            df_view_ativas["Próximo vencimento"] = df_view_ativas["next_due"].apply(
-                lambda d: d.strftime("%d/%m/%Y") if pd.notnull(d) else "-"
-            )
-            df_view_ativas["Total da compra"] = df_view_ativas["total_value"].map(format_brl)
-            df_view_ativas["Saldo a pagar"] = df_view_ativas["remaining_value"].map(format_brl)
+            df_view_ativas["Total da compra"] = format_brl_series(df_view_ativas["total_value"])
+            df_view_ativas["Saldo a pagar"] = format_brl_series(df_view_ativas["remaining_value"])
 
             df_view_ativas = df_view_ativas.rename(
                 columns={
@@ -501,7 +527,8 @@ def pagina_cartao(df: pd.DataFrame):
                 }
             )
 
-            df_view_ativas = df_view_ativas[
+            # texto livre no editor (categórica viraria selectbox restrito)
+            df_view_ativas = df_view_ativas.astype({"Cartão": object, "Categoria": object})[
                 [
                     "ID",
                     "Cartão",
@@ -543,28 +570,12 @@ def pagina_cartao(df: pd.DataFrame):
                 )
 
                 if st.button("Salvar alterações (ativas)"):
-                    base = df_view_ativas.set_index("ID")
-                    novo = edited_ativas.set_index("ID")
-
-                    alteracoes = 0
-                    for idx in novo.index:
-                        row_old = base.loc[idx]
-                        row_new = novo.loc[idx]
-
-                        if (
-                            row_old["Cartão"] != row_new["Cartão"]
-                            or row_old["Categoria"] != row_new["Categoria"]
-                            or row_old["Descrição"] != row_new["Descrição"]
-                        ):
-                            update_transaction_fields(
-                                transaction_id=int(idx),
-                                new_category=row_new["Categoria"],
-                                new_card_name=row_new["Cartão"],
-                                new_description=row_new["Descrição"],
-                            )
-                            alteracoes += 1
+                    mudancas = coletar_alteracoes(df_view_ativas, edited_ativas)
 
+                    # todas as edições numa única ida ao banco
+                    alteracoes = len(mudancas)
                     if alteracoes > 0:
+                        update_transactions_fields(db_connection, invalidate_data_cache, mudancas)
                         st.success(f"{alteracoes} compra(s) ativa(s) atualizada(s) com sucesso.")
                     else:
                         st.info("Nenhuma alteração detectada nas dívidas ativas.")
@@ -581,10 +592,8 @@ def pagina_cartao(df: pd.DataFrame):
             st.write("Nenhuma compra 100% quitada encontrada com os filtros selecionados.")
         else:
             df_view_conc = df_concluidas.copy()
-            df_view_conc["Data da compra"] = df_view_conc["purchase_date"].apply(
-                lambda d: d.strftime("%d/%m/%Y")
-            )
-            df_view_conc["Total da compra"] = df_view_conc["total_value"].map(format_brl)
+            df_view_conc["Data da compra"] = df_view_conc["purchase_date"].dt.strftime("%d/%m/%Y")
+            df_view_conc["Total da compra"] = format_brl_series(df_view_conc["total_value"])
 
             df_view_conc = df_view_conc.rename(
                 columns={
@@ -596,7 +605,7 @@ def pagina_cartao(df: pd.DataFrame):
                 }
             )
 
-            df_view_conc = df_view_conc[
+            df_view_conc = df_view_conc.astype({"Cartão": object, "Categoria": object})[
                 [
                     "ID",
                     "Cartão",
@@ -633,28 +642,12 @@ def pagina_cartao(df: pd.DataFrame):
                 )
 
                 if st.button("Salvar alterações (concluídas)"):
-                    base_c = df_view_conc.set_index("ID")
-                    novo_c = edited_conc.set_index("ID")
-
-                    alteracoes_c = 0
-                    for idx in novo_c.index:
-                        row_old = base_c.loc[idx]
-                        row_new = novo_c.loc[idx]
-
-                        if (
-                            row_old["Cartão"] != row_new["Cartão"]
-                            or row_old["Categoria"] != row_new["Categoria"]
-                            or row_old["Descrição"] != row_new["Descrição"]
-                        ):
-                            update_transaction_fields(
-                                transaction_id=int(idx),
-                                new_category=row_new["Categoria"],
-                                new_card_name=row_new["Cartão"],
-                                new_description=row_new["Descrição"],
-                            )
-                            alteracoes_c += 1
+                    mudancas_c = coletar_alteracoes(df_view_conc, edited_conc)
 
+                    # todas as edições numa única ida ao banco
+                    alteracoes_c = len(mudancas_c)
                     if alteracoes_c > 0:
+                        update_transactions_fields(db_connection, invalidate_data_cache, mudancas_c)
                         st.success(f"{alteracoes_c} compra(s) concluída(s) atualizada(s) com sucesso.")
                     else:
                         st.info("Nenhuma alteração detectada nas dívidas concluídas.")
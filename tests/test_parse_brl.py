@@ -0,0 +1,35 @@
+import pandas as pd
+import pytest
+
+pytest.importorskip("streamlit")
+pytest.importorskip("psycopg2")
+pytest.importorskip("altair")
+
+from Controle import parse_brl_series, parse_brl_to_float
+
+
+ENTRADAS = [
+    "R$ 1.234,56",
+    "1.234,56",
+    "-10,00",
+    "R$ -0,40",
+    " 7 ",
+    "1.000",
+    "1e3",
+    "(5,00)",
+    "12abc3",
+    "abc",
+    "",
+    None,
+]
+
+
+def test_parse_brl_series_concorda_com_parse_brl_to_float():
+    esperado = [parse_brl_to_float(v) for v in ENTRADAS]
+    obtido = parse_brl_series(pd.Series(ENTRADAS, dtype=object)).tolist()
+    assert obtido == esperado
+
+
+def test_parse_brl_series_rejeita_texto_invalido():
+    obtido = parse_brl_series(pd.Series(["(5,00)", "12abc3"], dtype=object)).tolist()
+    assert obtido == [0.0, 0.0]